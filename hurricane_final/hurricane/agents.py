@@ -2,32 +2,30 @@
 """
 FINAL CORRECTED agents.py - All issues fixed
 """
-from typing import List, Tuple
+from collections import deque
+from typing import List, Optional, Tuple
 from .world import TRAVERSE, EQUIP, UNEQUIP, NOOP, TERMINATE, World, AgentState
-from .graph import Graph
-from .search import SearchState, normalize_people, normalize_kits, greedy_one_step, a_star, rta_star, world_globals
+from .graph import Graph, reconstruct_path
+from .bidir_astar import bidir_astar, a_star_bidir
+from .search import SearchState, greedy_one_step, a_star, rta_star
+
+def _path_to_actions(world: World, path: List[int]) -> List[Tuple[str, tuple]]:
+    edge_of = world.graph.edge_of
+    return [(TRAVERSE, (path[i+1], edge_of[(path[i], path[i+1])])) for i in range(len(path)-1)]
 
 def shortest_path_to_target(world: World, a: AgentState) -> List[Tuple[str, tuple]]:
+    """Actions to the nearest target."""
     targets = [v for v,c in world.people.items() if c>0]
     if not targets:
         return []
-    sp = world.graph.dijkstra(a.pos, amphib=a.equipped, P=world.P)
-    reachable = [(sp[t][0], t) for t in targets if sp[t][0] < float('inf')]
+    # only the nearest target is followed, so the search can stop once it is settled
+    dist, prev = world.graph.dijkstra_to_set(a.pos, targets, amphib=a.equipped, P=world.P, first_only=True)
+    reachable = [(dist[t], t) for t in targets if dist[t] < float('inf')]
     if not reachable:
         return []
     reachable.sort(key=lambda x: (x[0], x[1]))
     _, tgt = reachable[0]
-    path = sp[tgt][1]
-    actions = []
-    for i in range(len(path)-1):
-        u = path[i]; v = path[i+1]
-        cand = []
-        for _,e in world.graph.neighbors(u):
-            if (e.u==u and e.v==v) or (e.u==v and e.v==u):
-                cand.append(e.id)
-        eid = min(cand)
-        actions.append((TRAVERSE, (v, eid)))
-    return actions
+    return _path_to_actions(world, reconstruct_path(prev, tgt))
 
 class HumanAgent:
     def __call__(self, world: World, a: AgentState) -> Tuple[str, tuple]:
@@ -88,7 +86,7 @@ class StupidGreedyAgent:
             return (TERMINATE, ())
         
         # Equip kit if at kit location and not equipped
-        if not a.equipped and a.pos in world.kits:
+        if not a.equipped and world.has_kit(a.pos):
             targets = [v for v, c in world.people.items() if c > 0]
             if targets:
                 return (EQUIP, ())
@@ -107,25 +105,20 @@ class StupidGreedyAgent:
             
             # If no path and not equipped, try to get kit first
             if not plan and not a.equipped and world.kits:
-                sp = world.graph.dijkstra(a.pos, amphib=False, P=world.P)
-                reachable_kits = [(sp[k][0], k) for k in world.kits if sp[k][0] < float('inf')]
+                # if there were targets but none was reachable, the search above
+                # ran to completion and was cached, so this is a cache hit; with
+                # no targets left no search ran, and this one is paid in full
+                dist, prev = world.graph.dijkstra_with_paths(a.pos, amphib=False, P=world.P)
+                reachable_kits = [(dist[k], k) for k in world.kits if dist[k] < float('inf')]
                 if reachable_kits:
                     reachable_kits.sort(key=lambda x: (x[0], x[1]))
                     _, kit_pos = reachable_kits[0]
-                    path = sp[kit_pos][1]
-                    plan = []
-                    for i in range(len(path)-1):
-                        u = path[i]; v = path[i+1]
-                        cand = []
-                        for _,e in world.graph.neighbors(u):
-                            if (e.u==u and e.v==v) or (e.u==v and e.v==u):
-                                cand.append(e.id)
-                        eid = min(cand)
-                        plan.append((TRAVERSE, (v, eid)))
+                    plan = _path_to_actions(world, reconstruct_path(prev, kit_pos))
                     if plan:
                         a.internal["going_for_kit"] = True
             
-            a.internal["plan"] = plan
+            # plans are consumed from the front: a deque pops in O(1)
+            plan = a.internal["plan"] = deque(plan)
             if plan and not a.internal.get("going_for_kit", False):
                 for act in reversed(plan):
                     if act[0] == TRAVERSE:
@@ -138,8 +131,7 @@ class StupidGreedyAgent:
             a.internal["terminated"] = True
             return (TERMINATE, ())
         
-        action = plan.pop(0)
-        a.internal["plan"] = plan
+        action = plan.popleft()
         
         if a.internal.get("going_for_kit", False) and not plan:
             a.internal["going_for_kit"] = False
@@ -149,43 +141,41 @@ class StupidGreedyAgent:
 class ThiefAgent:
     def __call__(self, world: World, a: AgentState) -> Tuple[str, tuple]:
         if not a.equipped:
-            if a.pos in world.kits:
+            if world.has_kit(a.pos):
                 return (EQUIP, ())
             kits = list(world.kits)
             if not kits:
                 return (NOOP, ())
-            sp = world.graph.dijkstra(a.pos, amphib=False, P=world.P)
-            reachable = [(sp[k][0], k) for k in kits if sp[k][0] < float('inf')]
+            dist, prev = world.graph.dijkstra_with_paths(a.pos, amphib=False, P=world.P)
+            reachable = [(dist[k], k) for k in kits if dist[k] < float('inf')]
             if not reachable:
                 return (NOOP, ())
             reachable.sort(key=lambda x:(x[0], x[1]))
             _, tgt = reachable[0]
-            path = sp[tgt][1]
+            path = reconstruct_path(prev, tgt)
             if len(path) <= 1:
                 return (NOOP, ())
             u = path[0]; v = path[1]
-            cand = []
-            for _,e in world.graph.neighbors(u):
-                if (e.u==u and e.v==v) or (e.u==v and e.v==u):
-                    cand.append(e.id)
-            eid = min(cand)
-            return (TRAVERSE, (v, eid))
+            return (TRAVERSE, (v, world.graph.edge_of[(u, v)]))
         
-        other_positions = a.internal.get("others", [])
+        positions = a.internal.get("positions", [])
+        me = a.internal.get("index")
+        other_positions = [p for k, p in enumerate(positions) if k != me]
         if not other_positions:
             return (NOOP, ())
         
         best = None
         best_score = -1
         
-        for v, e in world.graph.neighbors(a.pos):
-            if not world.can_traverse(a, e):
-                continue
-            
+        # walk the CSR slots passable in our kit state: no Edge objects, no flood test
+        indptr, indices, _, edge_ids = world.graph.csr_by_equipped(world.P)[a.equipped]
+        best_eid = None
+        for i in range(indptr[a.pos], indptr[a.pos + 1]):
+            v = indices[i]
             score = 0
-            sp_from_v = world.graph.dijkstra(v, amphib=True, P=world.P)
+            dist_from_v = world.graph.dijkstra_dists(v, amphib=True, P=world.P)
             for other_pos in other_positions:
-                d = sp_from_v[other_pos][0]
+                d = dist_from_v[other_pos]
                 if d == float('inf'):
                     d = 1e9
                 score += d
@@ -193,23 +183,17 @@ class ThiefAgent:
             if score > best_score or (score == best_score and (best is None or v < best)):
                 best_score = score
                 best = v
+                best_eid = edge_ids[i]  # slots are in edge id order: the smallest id to v
         
         if best is None:
             return (NOOP, ())
         
-        cand = []
-        for _, e in world.graph.neighbors(a.pos):
-            vv = e.v if e.u == a.pos else e.u
-            if vv == best:
-                cand.append(e.id)
-        eid = min(cand)
-        return (TRAVERSE, (best, eid))
+        return (TRAVERSE, (best, best_eid))
 
 def _make_search_state(world: World, a: AgentState) -> SearchState:
-    people = dict(world.people)
-    if a.pos in people:
-        people[a.pos] = 0
-    return SearchState(a.pos, a.equipped, normalize_people(people), normalize_kits(world.kits))
+    # people at our own vertex count as already picked up
+    people = world.people_mask() & ~(1 << a.pos)
+    return SearchState(a.pos, a.equipped, people, world.kits_mask())
 
 class GreedySearchAgent:
     def __call__(self, world: World, a: AgentState) -> Tuple[str, tuple]:
@@ -220,11 +204,9 @@ class GreedySearchAgent:
         # Does NOT plan ahead. Always re-evaluates.
         
         s0 = _make_search_state(world, a)
-        world_globals["Q"] = world.Q
-        world_globals["U"] = world.U
         
         # Always 1 expansion per move
-        plan, expansions = greedy_one_step(world.graph, world.P, s0)
+        plan, expansions = greedy_one_step(world.graph, world.P, world.Q, world.U, s0)
         world.time += expansions * a.internal.get("T", 0.0)
         
         if not plan:
@@ -234,8 +216,9 @@ class GreedySearchAgent:
         return plan[0]
 
 class AStarAgent:
-    def __init__(self, LIMIT: int = 10000):
+    def __init__(self, LIMIT: int = 10000, bidirectional: bool = False):
         self.LIMIT = LIMIT
+        self.bidirectional = bidirectional
     
     def __call__(self, world: World, a: AgentState) -> Tuple[str, tuple]:
         if a.internal.get("terminated", False):
@@ -245,27 +228,34 @@ class AStarAgent:
         
         if not plan:
             s0 = _make_search_state(world, a)
-            world_globals["Q"] = world.Q
-            world_globals["U"] = world.U
-            plan, expansions = a_star(world.graph, world.P, s0, LIMIT=self.LIMIT)
+            targets = s0.targets()
+            if self.bidirectional and len(targets) == 1 and not s0.equipped and not s0.kits_mask:
+                # No kit can ever be picked up, so the plan is plain single-pair travel
+                plan, expansions = bidir_astar(world.graph, world.P, s0.pos, targets[0], LIMIT=self.LIMIT)
+            elif self.bidirectional:
+                plan, expansions = a_star_bidir(world.graph, world.P, world.Q, world.U, s0, LIMIT=self.LIMIT)
+            else:
+                plan, expansions = a_star(world.graph, world.P, world.Q, world.U, s0, LIMIT=self.LIMIT)
             world.time += expansions * a.internal.get("T", 0.0)
             
             if not plan:
                 a.internal["terminated"] = True
                 return (TERMINATE, ())
             
-            a.internal["plan"] = plan[:]
+            a.internal["plan"] = deque(plan)
         
         if not a.internal["plan"]:
             a.internal["terminated"] = True
             return (TERMINATE, ())
         
-        action = a.internal["plan"].pop(0)
+        action = a.internal["plan"].popleft()
         return action
 
 class RealTimeAStarAgent:
-    def __init__(self, L: int = 10):
+    def __init__(self, L: int = 10, batch: int = 1, beam: Optional[int] = None):
         self.L = L
+        self.batch = batch
+        self.beam = beam
     
     def __call__(self, world: World, a: AgentState) -> Tuple[str, tuple]:
         if a.internal.get("terminated", False):
@@ -284,9 +274,8 @@ class RealTimeAStarAgent:
             return (TERMINATE, ())
         
         s0 = _make_search_state(world, a)
-        world_globals["Q"] = world.Q
-        world_globals["U"] = world.U
-        plan, expansions = rta_star(world.graph, world.P, s0, L=self.L)
+        plan, expansions = rta_star(world.graph, world.P, world.Q, world.U, s0, L=self.L,
+                                     batch=self.batch, beam=self.beam)
         world.time += expansions * a.internal.get("T", 0.0)
         
         if not plan:
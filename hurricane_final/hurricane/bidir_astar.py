@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Bidirectional A* between two vertices of the graph.
+
+Forward and backward searches run on the same undirected graph, using the
+consistent average ("split") potentials
+
+    p_F(v) = (h_t(v) - h_s(v)) / 2        p_B(v) = -p_F(v)
+
+where h_s / h_t are optimistic distances to the start / goal (see
+heuristic._optimistic_dists). Because p_F + p_B = 0, a path through v costs
+exactly key_F(v) + key_B(v), so the search can stop as soon as
+top(OpenF) + top(OpenB) >= best meeting cost found so far.
+
+This only solves single-pair travel under a FIXED kit state. It is exact for
+the evacuation problem only when the agent is unequipped, no kits are left to
+pick up and a single target remains. a_star_bidir below lifts the single
+target restriction by searching over (vertex, people left) states.
+"""
+from typing import Dict, List, Tuple
+from .world import TRAVERSE
+from .graph import Graph
+from .heuristic import _optimistic_dists, _mst_cost
+from .search import SearchState, a_star, make_heuristic
+import heapq, math
+from functools import lru_cache
+from itertools import count
+
+def bidir_astar(graph: Graph, P: int, start: int, goal: int, amphib: bool = False, LIMIT: int = 10000):
+    """
+    Returns (plan, expansions) where plan is a list of TRAVERSE actions from
+    start to goal ([] if goal is unreachable or LIMIT was exceeded).
+    """
+    if start == goal:
+        return [], 0
+    hs = _optimistic_dists(graph, P, start)
+    ht = _optimistic_dists(graph, P, goal)
+    if ht[start] == math.inf:
+        return [], 0
+
+    indptr = graph.indptr; indices = graph.indices; edge_ids = graph.edge_ids
+    warr = graph.amphib_weights(P) if amphib else graph.w_normal
+
+    # index 0 = forward (from start), 1 = backward (from goal)
+    g: Tuple[Dict[int, float], Dict[int, float]] = ({start: 0.0}, {goal: 0.0})
+    par: Tuple[Dict[int, Tuple[int, int]], Dict[int, Tuple[int, int]]] = ({}, {})
+    closed = (set(), set())
+    sign = (1.0, -1.0)
+    p0 = (ht[start] - hs[start]) / 2
+    p1 = (ht[goal] - hs[goal]) / 2
+    open_ = ([(p0, start)], [(-p1, goal)])
+
+    best = math.inf
+    meet = None
+    cnt = 0
+    while open_[0] and open_[1]:
+        if open_[0][0][0] + open_[1][0][0] >= best:
+            break
+        side = 0 if open_[0][0][0] <= open_[1][0][0] else 1
+        _, u = heapq.heappop(open_[side])
+        if u in closed[side]:
+            continue
+        closed[side].add(u)
+        cnt += 1
+        if cnt > LIMIT:
+            return [], cnt
+        gs = g[side]; go = g[1 - side]
+        gu = gs[u]
+        for i in range(indptr[u], indptr[u+1]):
+            v = indices[i]
+            if hs[v] == math.inf or ht[v] == math.inf:
+                continue  # cannot lie on any start-goal path
+            ng = gu + warr[i]
+            if ng == math.inf:
+                continue  # flooded edge without a kit
+            if ng < gs.get(v, math.inf):
+                gs[v] = ng
+                par[side][v] = (u, edge_ids[i])
+                heapq.heappush(open_[side], (ng + sign[side] * (ht[v] - hs[v]) / 2, v))
+                if v in go and ng + go[v] < best:
+                    best = ng + go[v]
+                    meet = v
+
+    if meet is None:
+        return [], cnt
+
+    plan: List[Tuple[str, tuple]] = []
+    v = meet
+    while v != start:
+        u, eid = par[0][v]
+        plan.append((TRAVERSE, (v, eid)))
+        v = u
+    plan.reverse()
+    v = meet
+    while v != goal:
+        u, eid = par[1][v]
+        plan.append((TRAVERSE, (u, eid)))
+        v = u
+    return plan, cnt
+
+MAX_GOALS = 128  # a_star_bidir searches forward only beyond this many goal states
+
+def a_star_bidir(graph: Graph, P: int, Q: int, U: int, start: SearchState,
+                 LIMIT: int = 10000, max_goals: int = MAX_GOALS):
+    """
+    Bidirectional A* over search states: a forward search from `start` meets
+    a backward search seeded from every goal state at once.
+
+    The goal set is small only when no kit is in play (start unequipped, no
+    kits anywhere): then the last move is the pickup at some target t, so the
+    goals are exactly (t, no people left) for each target t. In every other
+    case, or with more than max_goals targets, this is plain a_star.
+
+    Forward potential is admissible_heuristic, backward potential an MST
+    bound over start, the targets already emptied and the current vertex.
+    Both are consistent, so max(top f forward, top f backward) bounds every
+    path not found yet and the search stops once it reaches the best meeting
+    cost. The side with the smaller open list is expanded next.
+    States are (pos, people_mask) pairs over the dry CSR; NOOP never lies on
+    an optimal plan and is not generated.
+    Returns (plan, expansions) like a_star.
+    """
+    targets = start.targets()
+    if not targets:
+        return [], 0
+    if start.equipped or start.kits_mask or len(targets) > max_goals:
+        return a_star(graph, P, Q, U, start, LIMIT)
+    if graph.indptr is None:
+        graph.finalize()
+    indptr = graph.dry_indptr; indices = graph.dry_indices
+    weights = graph.dry_weights; edge_ids = graph.dry_edge_ids
+    H = make_heuristic(graph, P)
+    hs = _optimistic_dists(graph, P, start.pos)
+    full = start.people_mask
+    inf = math.inf
+    # A plan reaching (v, m) went from start through every target emptied in
+    # m and ends at v: a path over those points, so it costs at least their
+    # MST (optimistic metric). Consistent, as the forward MST bound is.
+    dt = {t: _optimistic_dists(graph, P, t) for t in targets}
+
+    @lru_cache(maxsize=None)
+    def HB(v: int, m: int) -> float:
+        rows = [hs] + [dt[t] for t in targets if not (m >> t) & 1]
+        pts = [start.pos] + [t for t in targets if not (m >> t) & 1] + [v]
+        D = [[r[x] for x in pts] for r in rows]
+        D.append([r[v] for r in rows] + [0.0])
+        return _mst_cost(D)
+
+    s0 = (start.pos, full)
+    # index 0 = forward (from start), 1 = backward (from the goal set)
+    g: Tuple[Dict[tuple, float], Dict[tuple, float]] = ({s0: 0.0}, {})
+    par: Tuple[Dict[tuple, tuple], Dict[tuple, tuple]] = ({s0: None}, {})
+    tie = count()
+    open_ = ([(H(start.pos, full), next(tie), 0.0, s0)], [])
+    for t in targets:
+        h = HB(t, 0)
+        if h < inf:
+            g[1][(t, 0)] = 0.0
+            par[1][(t, 0)] = None
+            open_[1].append((h, next(tie), 0.0, (t, 0)))
+    heapq.heapify(open_[1])
+
+    best = inf
+    meet = None
+    cnt = 0
+    pop = heapq.heappop; push = heapq.heappush
+    while open_[0] and open_[1]:
+        if max(open_[0][0][0], open_[1][0][0]) >= best:
+            break
+        side = 0 if len(open_[0]) <= len(open_[1]) else 1
+        _, _, gx, x = pop(open_[side])
+        gs = g[side]; go = g[1 - side]
+        if gx != gs[x]:
+            continue  # stale entry
+        cnt += 1
+        if cnt > LIMIT:
+            return [], cnt
+        u, m = x
+        for i in range(indptr[u], indptr[u+1]):
+            v = indices[i]
+            ng = gx + weights[i]
+            if side == 0:
+                # forward: arriving at v picks up whoever is there
+                ys = ((v, m & ~(1 << v)),)
+                action = (TRAVERSE, (v, edge_ids[i]))
+            else:
+                # backward: predecessors (v, m') with v -> u leading to (u, m);
+                # the move either found u already empty or emptied it
+                if (m >> v) & 1:
+                    continue
+                ys = ((v, m), (v, m | (1 << u))) if (full >> u) & 1 and v != u else ((v, m),)
+                action = (TRAVERSE, (u, edge_ids[i]))
+            for y in ys:
+                if ng >= gs.get(y, inf):
+                    continue
+                h = H(y[0], y[1]) if side == 0 else HB(y[0], y[1])
+                if h == inf:
+                    continue  # cannot lie on any start-goal path
+                gs[y] = ng
+                par[side][y] = (x, action)
+                push(open_[side], (ng + h, next(tie), ng, y))
+                if y in go and ng + go[y] < best:
+                    best = ng + go[y]
+                    meet = y
+
+    if meet is None:
+        return [], cnt
+
+    plan: List[Tuple[str, tuple]] = []
+    y = meet
+    while par[0][y] is not None:
+        y, action = par[0][y]
+        plan.append(action)
+    plan.reverse()
+    y = meet
+    while par[1][y] is not None:
+        y, action = par[1][y]
+        plan.append(action)
+    return plan, cnt
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import heapq, math
 
+SP_CACHE_SIZE = 512  # max cached single-source searches per graph
+
 @dataclass
 class Edge:
     u: int
@@ -16,47 +18,255 @@ class Graph:
     n: int
     edges: Dict[int, Edge] = field(default_factory=dict)
     adj: Dict[int, List[int]] = field(default_factory=dict)  # vertex -> list of edge ids
+    # CSR view of adj, built by finalize(): the neighbours of u live in
+    # indices[indptr[u]:indptr[u+1]], ordered by edge id.
+    indptr: Optional[List[int]] = field(default=None, init=False, repr=False)
+    indices: Optional[List[int]] = field(default=None, init=False, repr=False)
+    weights: Optional[List[int]] = field(default=None, init=False, repr=False)
+    edge_ids: Optional[List[int]] = field(default=None, init=False, repr=False)
+    # Per-slot traversal cost without a kit (inf on flooded edges); the
+    # with-kit costs w*P are built on demand per P by amphib_weights().
+    w_normal: Optional[List[float]] = field(default=None, init=False, repr=False)
+    _w_amphib: Dict[int, List[int]] = field(default_factory=dict, init=False, repr=False)
+    # "Dry" CSR: the same layout with flooded slots filtered out, i.e. the
+    # graph as seen without a kit. Kit-less searches walk only passable edges.
+    dry_indptr: Optional[List[int]] = field(default=None, init=False, repr=False)
+    dry_indices: Optional[List[int]] = field(default=None, init=False, repr=False)
+    dry_weights: Optional[List[int]] = field(default=None, init=False, repr=False)
+    dry_edge_ids: Optional[List[int]] = field(default=None, init=False, repr=False)
+    # Per-vertex ((v, Edge), ...) tuples handed out by neighbors(), built on first use
+    _nbrs: Optional[List[Optional[tuple]]] = field(default=None, init=False, repr=False)
+    # Per-edge-id SoA view of edges (None for unused ids), built by finalize()
+    edge_w: Optional[List[Optional[int]]] = field(default=None, init=False, repr=False)
+    edge_flooded: Optional[List[Optional[bool]]] = field(default=None, init=False, repr=False)
+    # (u, v) -> smallest id among the edges joining u and v, both orientations
+    edge_of: Optional[Dict[Tuple[int, int], int]] = field(default=None, init=False, repr=False)
+    # Bumped whenever an edge's flooded flag changes; cached searches are dropped with it.
+    flood_version: int = field(default=0, init=False, repr=False)
+    _sp_cache: Dict[Tuple[int, bool, int], Tuple[List[float], List[int]]] = field(default_factory=dict, init=False, repr=False)
 
     def add_edge(self, eid: int, u: int, v: int, w: int, flooded: bool):
         self.edges[eid] = Edge(u, v, w, flooded, eid)
         self.adj.setdefault(u, []).append(eid)
         self.adj.setdefault(v, []).append(eid)
+        self.indptr = None
+        self._sp_cache.clear()
+
+    def set_flooded(self, eid: int, flooded: bool):
+        e = self.edges[eid]
+        if e.flooded != flooded:
+            e.flooded = flooded
+            self.flood_version += 1
+            self.indptr = None
+            self._sp_cache.clear()
 
-    def neighbors(self, u: int):
-        for eid in sorted(self.adj.get(u, [])):
+    def finalize(self):
+        """Build the CSR arrays from adj (called lazily after the last add_edge)."""
+        indptr = [0] * (self.n + 2)
+        indices: List[int] = []
+        weights: List[int] = []
+        flooded: List[bool] = []
+        edge_ids: List[int] = []
+        for u in range(self.n + 1):
+            for eid in sorted(self.adj.get(u, [])):
+                e = self.edges[eid]
+                indices.append(e.v if e.u == u else e.u)
+                weights.append(e.w)
+                flooded.append(e.flooded)
+                edge_ids.append(eid)
+            indptr[u + 1] = len(indices)
+        self.indices = indices
+        self.weights = weights
+        self.edge_ids = edge_ids
+        self.w_normal = [math.inf if f else w for w, f in zip(weights, flooded)]
+        self._w_amphib = {}
+        dry_indptr = [0] * (self.n + 2)
+        dry_slots: List[int] = []
+        for u in range(self.n + 1):
+            dry_slots.extend(i for i in range(indptr[u], indptr[u + 1]) if not flooded[i])
+            dry_indptr[u + 1] = len(dry_slots)
+        self.dry_indptr = dry_indptr
+        self.dry_indices = [indices[i] for i in dry_slots]
+        self.dry_weights = [weights[i] for i in dry_slots]
+        self.dry_edge_ids = [edge_ids[i] for i in dry_slots]
+        edge_of: Dict[Tuple[int, int], int] = {}
+        for eid in sorted(self.edges, reverse=True):
             e = self.edges[eid]
-            v = e.v if e.u == u else e.u
-            yield v, e
+            edge_of[(e.u, e.v)] = eid
+            edge_of[(e.v, e.u)] = eid
+        self.edge_of = edge_of
+        size = max(self.edges, default=-1) + 1
+        edge_w: List[Optional[int]] = [None] * size
+        edge_flooded: List[Optional[bool]] = [None] * size
+        for eid, e in self.edges.items():
+            edge_w[eid] = e.w
+            edge_flooded[eid] = e.flooded
+        self.edge_w = edge_w
+        self.edge_flooded = edge_flooded
+        self._nbrs = [None] * (self.n + 1)
+        self.indptr = indptr
+
+    def amphib_weights(self, P: int) -> List[int]:
+        """Per-slot traversal cost with a kit (w*P), cached per P."""
+        if self.indptr is None:
+            self.finalize()
+        warr = self._w_amphib.get(P)
+        if warr is None:
+            warr = self._w_amphib[P] = [w * P for w in self.weights]
+        return warr
+
+    def csr_by_equipped(self, P: int) -> Tuple[tuple, tuple]:
+        """
+        (indptr, indices, weights, edge_ids) of the edges passable in each kit
+        state, indexed by equipped: [0] is the dry CSR, [1] the full CSR with
+        w*P costs. Walking one of them needs no per-edge flood test.
+        """
+        if self.indptr is None:
+            self.finalize()
+        return ((self.dry_indptr, self.dry_indices, self.dry_weights, self.dry_edge_ids),
+                (self.indptr, self.indices, self.amphib_weights(P), self.edge_ids))
+
+    def neighbors(self, u: int) -> tuple:
+        """((v, Edge), ...) around u in CSR order; cached until the graph changes."""
+        if self.indptr is None:
+            self.finalize()
+        nb = self._nbrs[u]
+        if nb is None:
+            edges = self.edges
+            nb = self._nbrs[u] = tuple((self.indices[i], edges[self.edge_ids[i]])
+                                       for i in range(self.indptr[u], self.indptr[u+1]))
+        return nb
+
+    def dijkstra_with_paths(self, start: int, amphib: bool, P: int) -> Tuple[List[float], List[int]]:
+        """
+        (dist, prev) from start, indexed by vertex id (index 0 unused).
+        Use reconstruct_path(prev, t) for the path to a reachable t.
+        Results are cached and shared - callers must not mutate them.
+        """
+        key = (start, amphib, P)
+        res = self._sp_cache.get(key)
+        if res is None:
+            if self.indptr is None:
+                self.finalize()
+            res = self._run_kernel(start, amphib, P)
+            self._cache_search(key, res)
+        return res
+
+    def _run_kernel(self, start: int, amphib: bool, P: int,
+                    targets: Optional[Set[int]] = None, first_only: bool = False) -> Tuple[List[float], List[int]]:
+        if amphib:
+            return dijkstra_csr(self.indptr, self.indices, self.amphib_weights(P), start, targets, first_only)
+        return dijkstra_csr(self.dry_indptr, self.dry_indices, self.dry_weights, start, targets, first_only)
+
+    def _cache_search(self, key: Tuple[int, bool, int], res: Tuple[List[float], List[int]]):
+        if len(self._sp_cache) >= SP_CACHE_SIZE:
+            self._sp_cache.clear()
+        self._sp_cache[key] = res
+
+    def dijkstra_to_set(self, start: int, targets: Iterable[int], amphib: bool, P: int,
+                        first_only: bool = False) -> Tuple[List[float], List[int]]:
+        """
+        Like dijkstra_with_paths, but stops once every vertex in targets is
+        settled (with first_only: once the nearest one is). dist/prev are final
+        for the targets that were reached and for anything nearer than them;
+        other entries may be partial. Unreachable targets stay inf.
+        A cached full search is returned when one exists. A search that never
+        got to stop early (some target unreachable) is a full search and is
+        cached like one, so e.g. the follow-up kit search from the same vertex
+        after "no target reachable" is free.
+        """
+        key = (start, amphib, P)
+        res = self._sp_cache.get(key)
+        if res is not None:
+            return res
+        if self.indptr is None:
+            self.finalize()
+        remaining = set(targets)
+        k = len(remaining)
+        res = self._run_kernel(start, amphib, P, remaining, first_only)
+        # the kernel drains `remaining` as targets settle; it can only have
+        # stopped early once all of them (first_only: any of them) settled
+        if remaining and (not first_only or len(remaining) == k):
+            self._cache_search(key, res)
+        return res
+
+    def dijkstra_dists(self, start: int, amphib: bool, P: int) -> List[float]:
+        """Distances from start, indexed by vertex id (index 0 unused)."""
+        return self.dijkstra_with_paths(start, amphib, P)[0]
 
     def dijkstra(self, start: int, amphib: bool, P: int) -> Dict[int, Tuple[float, List[int]]]:
-        """Return dist and path (as vertices)."""
-        dist = {v: math.inf for v in range(1, self.n+1)}
-        prev = {v: None for v in range(1, self.n+1)}
-        dist[start] = 0.0
-        pq = [(0.0, start)]
-        while pq:
-            d,u = heapq.heappop(pq)
-            if d != dist[u]: 
-                continue
-            for v,e in self.neighbors(u):
-                if (not amphib) and e.flooded:
-                    continue
-                cost = e.w * (P if amphib else 1)
-                nd = d + cost
-                if nd < dist[v] or (nd == dist[v] and v < u):
-                    dist[v] = nd
-                    prev[v] = u
-                    heapq.heappush(pq, (nd, v))
+        """Return dist and path (as vertices) for every vertex."""
+        dist, prev = self.dijkstra_with_paths(start, amphib, P)
         paths = {}
         for t in range(1, self.n+1):
             if dist[t] == math.inf:
                 paths[t] = (math.inf, [])
             else:
-                path = []
-                cur = t
-                while cur is not None:
-                    path.append(cur)
-                    cur = prev[cur]
-                path.reverse()
-                paths[t] = (dist[t], path)
+                paths[t] = (dist[t], reconstruct_path(prev, t))
         return paths
+
+def reconstruct_path(prev: List[int], t: int) -> List[int]:
+    """Vertex path from the search start to t; t must be reachable."""
+    path = []
+    cur = t
+    while cur != -1:
+        path.append(cur)
+        cur = prev[cur]
+    path.reverse()
+    return path
+
+_init_rows_cache: Dict[int, Tuple[List[float], List[int]]] = {}
+
+def init_rows(size: int) -> Tuple[List[float], List[int]]:
+    """
+    Shared all-inf / all-(-1) rows of the given size. Searches start from a
+    .copy() of these (one memcpy) instead of building fresh lists every call.
+    Never mutate the returned lists.
+    """
+    rows = _init_rows_cache.get(size)
+    if rows is None:
+        rows = _init_rows_cache[size] = ([math.inf] * size, [-1] * size)
+    return rows
+
+def dijkstra_csr(indptr: List[int], indices: List[int], warr: List[float], start: int,
+                 targets: Optional[Set[int]] = None, first_only: bool = False) -> Tuple[List[float], List[int]]:
+    """
+    Dijkstra kernel over flat CSR arrays (see Graph.finalize).
+    warr holds the per-slot edge cost matching indptr/indices: the dry CSR
+    with Graph.dry_weights for a kit-less search, the full CSR with
+    Graph.amphib_weights(P) with a kit. Slots with cost inf are never
+    relaxed, so a full CSR with Graph.w_normal also works.
+    Returns (dist, prev) indexed by vertex id; prev is -1 for the start and
+    for unreachable vertices.
+    With targets (consumed), the search stops after the last distance level
+    at which the targets (or the first one, with first_only) got settled;
+    finishing that level keeps tie-broken paths identical to a full search.
+    """
+    inf = math.inf
+    dist_init, prev_init = init_rows(len(indptr) - 1)
+    dist = dist_init.copy()
+    prev = prev_init.copy()
+    dist[start] = 0.0
+    pq = [(0.0, start)]
+    stop_d = inf
+    pop = heapq.heappop; push = heapq.heappush
+    while pq:
+        d,u = pop(pq)
+        if d != dist[u]:
+            continue
+        if targets is not None:
+            if d > stop_d:
+                break
+            if u in targets:
+                targets.discard(u)
+                if first_only or not targets:
+                    stop_d = d
+        for i in range(indptr[u], indptr[u+1]):
+            v = indices[i]
+            nd = d + warr[i]
+            dv = dist[v]
+            if nd < dv or (nd == dv and v < u and nd != inf):
+                dist[v] = nd
+                prev[v] = u
+                push(pq, (nd, v))
+    return dist, prev
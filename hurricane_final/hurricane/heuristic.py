@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 from typing import Dict, List, Tuple
 from .graph import Graph
-import heapq, math
+import heapq
 
 #!/usr/bin/env python3
 """
@@ -65,31 +65,51 @@ THEORETICAL COMPLEXITY:
 - Computing optimistic Dijkstra from one vertex: O(E log V)
 - Computing MST for k targets: O(k²)
 - Total heuristic evaluation: O(E log V) per call in worst case
-- In practice, we can cache distance computations for efficiency
+- In practice the per-source distances, the closest-target table and the MST
+  are cached per target set, so repeated calls are dictionary lookups
 """
 
 from typing import Dict, List, Tuple
-from .graph import Graph
-import heapq, math
+from .graph import Graph, init_rows
+import heapq
 
-def _optimistic_dists(graph: Graph, P: int, start: int) -> Dict[int, float]:
+def _optimistic_dists(graph: Graph, P: int, start: int) -> List[float]:
     """
     Optimistic single-source shortest paths:
       - All edges are traversable.
       - Edge cost = min(w, w*P). (Ignore equip/unequip times.)
     This is a LOWER BOUND on true travel time from 'start'.
+    An amphibious search never checks the flooded flag, and w*min(1,P) ==
+    min(w, w*P), so this is served by the graph's cached Dijkstra.
+    Returned list is indexed by vertex id and shared - do not mutate.
+    """
+    return graph.dijkstra_dists(start, amphib=True, P=min(1, P))
+
+def _multi_source_optimistic(graph: Graph, P: int, sources: List[int]) -> List[float]:
+    """
+    Optimistic distance from every vertex to its NEAREST vertex in 'sources',
+    in one Dijkstra pass with all sources seeded at distance 0.
+    Edges are undirected, so entry v equals min over s of optimistic_dist(v, s).
     """
-    dist = {v: math.inf for v in range(1, graph.n + 1)}
-    dist[start] = 0.0
-    pq: List[Tuple[float, int]] = [(0.0, start)]
+    if graph.indptr is None:
+        graph.finalize()
+    indptr = graph.indptr; indices = graph.indices
+    warr = graph.amphib_weights(min(1, P))
+    dist = init_rows(graph.n + 1)[0].copy()
+    pq: List[Tuple[float, int]] = []
+    for s in sources:
+        if dist[s] != 0.0:
+            dist[s] = 0.0
+            pq.append((0.0, s))
+    heapq.heapify(pq)
     while pq:
         d, u = heapq.heappop(pq)
         if d != dist[u]:
             continue
-        for v, e in graph.neighbors(u):
-            cost = min(e.w, e.w * P)   # optimistic lower bound per edge
-            nd = d + cost
-            if nd < dist[v] or (nd == dist[v] and v < u):
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + warr[i]
+            if nd < dist[v]:
                 dist[v] = nd
                 heapq.heappush(pq, (nd, v))
     return dist
@@ -105,32 +125,57 @@ def _pairwise_optimistic(graph: Graph, P: int, nodes: List[int]) -> Dict[int, Di
         table[s] = {t: d[t] for t in range(1, graph.n + 1)}
     return table
 
-def _mst_cost(nodes: List[int], dist: Dict[int, Dict[int, float]]) -> float:
-    if not nodes:
+def _mst_cost(D: List[List[float]]) -> float:
+    """
+    Dense Prim over the complete graph given by the k x k matrix D: O(k^2),
+    no heap. key[j] is the cheapest edge from the tree to node j.
+    """
+    k = len(D)
+    if k == 0:
         return 0.0
-    seen = {nodes[0]}
+    in_tree = [False] * k
+    in_tree[0] = True
+    key = list(D[0])
     total = 0.0
-    pq: List[Tuple[float, int, int]] = []
-    # initialize with edges from the root
-    for v in nodes[1:]:
-        heapq.heappush(pq, (dist[nodes[0]][v], nodes[0], v))
-    while len(seen) < len(nodes) and pq:
-        w, u, v = heapq.heappop(pq)
-        if v in seen:
-            continue
-        seen.add(v)
-        total += w
-        for x in nodes:
-            if x not in seen:
-                heapq.heappush(pq, (dist[v][x], v, x))
+    for _ in range(k - 1):
+        j = -1
+        for x in range(k):
+            if not in_tree[x] and (j < 0 or key[x] < key[j]):
+                j = x
+        total += key[j]
+        in_tree[j] = True
+        row = D[j]
+        for x in range(k):
+            if row[x] < key[x]:
+                key[x] = row[x]
     return total
 
-_dist_cache = {}
+# Per target set caches. Both depend only on the graph and P, which are fixed
+# for a whole search, so they are valid across states and across A* calls.
+_cache_owner = None     # (graph, P) the caches below were filled for
+# Keyed by the target set as a vertex bitmask (bit t set for target t).
+_to_any_cache: Dict[int, List[float]] = {}
+_mst_cache: Dict[int, float] = {}
 
 def clear_heuristic_cache():
     """Clear the distance cache - useful between different problem instances"""
-    global _dist_cache
-    _dist_cache = {}
+    global _cache_owner
+    _cache_owner = None
+    _to_any_cache.clear()
+    _mst_cache.clear()
+
+def _check_cache_owner(graph: Graph, P: int):
+    global _cache_owner
+    if _cache_owner is None or _cache_owner[0] is not graph or _cache_owner[1] != P:
+        clear_heuristic_cache()
+        _cache_owner = (graph, P)
+
+def _pairwise_optimistic_targets(graph: Graph, P: int, targets: List[int]) -> List[List[float]]:
+    """
+    Optimistic pairwise distance matrix among 'targets' (D[i][j] = dist from
+    targets[i] to targets[j]), read off the cached per-source searches.
+    """
+    return [list(map(_optimistic_dists(graph, P, t).__getitem__, targets)) for t in targets]
 
 def admissible_heuristic(graph: Graph, cur: int, targets: List[int], amphib: bool, P: int) -> float:
     """
@@ -142,22 +187,35 @@ def admissible_heuristic(graph: Graph, cur: int, targets: List[int], amphib: boo
         - edge cost = min(w, w*P)
         - no Q/U times
     """
-    if not targets:
-        return 0.0
-
-    # optimistic distance from current to each target
-    cache_key = (graph.n, P, cur)
-    if cache_key not in _dist_cache:
-        _dist_cache[cache_key] = _optimistic_dists(graph, P, cur)
-    dcur = _dist_cache[cache_key]
-    to_any = min(dcur[t] for t in targets)
-
-    # optimistic pairwise distances among targets, then MST
-    inner = {t: {} for t in targets}
+    mask = 0
     for t in targets:
-        dt = _optimistic_dists(graph, P, t)
-        for u in targets:
-            inner[t][u] = dt[u]
+        mask |= 1 << t
+    return heuristic_for_mask(graph, cur, mask, P)
+
+def heuristic_for_mask(graph: Graph, cur: int, people_mask: int, P: int) -> float:
+    """
+    admissible_heuristic with the targets given as a vertex bitmask, the form
+    search states carry. The mask is the cache key as is; the target list is
+    only unpacked when a cache misses.
+    """
+    if not people_mask:
+        return 0.0
 
-    mcost = _mst_cost(targets, inner)
+    _check_cache_owner(graph, P)
+
+    # optimistic distance from current to the closest target: one lookup in the
+    # multi-source table instead of a min over k per-target distances
+    to_any_dists = _to_any_cache.get(people_mask)
+    if to_any_dists is None:
+        targets = [t for t in range(people_mask.bit_length()) if (people_mask >> t) & 1]
+        to_any_dists = _to_any_cache[people_mask] = _multi_source_optimistic(graph, P, targets)
+    to_any = to_any_dists[cur]
+
+    # optimistic pairwise distances among targets, then MST.
+    # The MST only depends on the target set, which changes only on a rescue.
+    mcost = _mst_cache.get(people_mask)
+    if mcost is None:
+        targets = [t for t in range(people_mask.bit_length()) if (people_mask >> t) & 1]
+        D = _pairwise_optimistic_targets(graph, P, targets)
+        mcost = _mst_cache[people_mask] = _mst_cost(D)
     return to_any + mcost
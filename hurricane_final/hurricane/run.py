@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import argparse
-from typing import List
-from .world import World, AgentState, parse_world_from_file, TRAVERSE, EQUIP, UNEQUIP, NOOP, TERMINATE
+from typing import List, Optional
+from .world import World, AgentState, parse_world_from_file, TRAVERSE, TERMINATE, IDLE_ACTIONS
 from .agents import HumanAgent, StupidGreedyAgent, ThiefAgent, GreedySearchAgent, AStarAgent, RealTimeAStarAgent
 
 AGENT_TYPES = {
@@ -20,21 +20,21 @@ def can_any_agent_reach_targets(world: World, agents: List[AgentState]) -> bool:
         return False
     
     for a in agents:
-        if a.agent_type == "thief":
+        if a.is_thief:
             continue
-        sp = world.graph.dijkstra(a.pos, amphib=a.equipped, P=world.P)
+        dist = world.graph.dijkstra_dists(a.pos, amphib=a.equipped, P=world.P)
         for t in targets:
-            if sp[t][0] < float('inf'):
+            if dist[t] < float('inf'):
                 return True
         
-        # Check if agent can equip a kit and reach targets
-        if not a.equipped:
-            for kit_v in world.kits:
-                if sp[kit_v][0] < float('inf'):
-                    sp_with_kit = world.graph.dijkstra(kit_v, amphib=True, P=world.P)
-                    for t in targets:
-                        if sp_with_kit[t][0] < float('inf'):
-                            return True
+        # Check if agent can equip a kit and reach targets. With a kit every edge
+        # is passable, so any kit we can walk to reaches exactly what an
+        # amphibious search from our own position reaches: one search, not one per kit.
+        if not a.equipped and any(dist[kit_v] < float('inf') for kit_v in world.kits):
+            dist_with_kit, _ = world.graph.dijkstra_to_set(a.pos, targets, amphib=True, P=world.P, first_only=True)
+            for t in targets:
+                if dist_with_kit[t] < float('inf'):
+                    return True
     return False
 
 def fmt_world(world: World, agents: List[AgentState]) -> str:
@@ -51,17 +51,26 @@ def fmt_world(world: World, agents: List[AgentState]) -> str:
     lines.append("Kits at: " + (" ".join(f"V{v}" for v in sorted(world.kits)) if world.kits else "(none)"))
     return "\n".join(lines)
 
-def main():
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run one simulation; argv defaults to sys.argv[1:]. Returns the exit status."""
     ap = argparse.ArgumentParser(description="Hurricane Evacuation Problem simulator")
     ap.add_argument("--input", required=True, help="Path to graph file (ASCII format)")
     ap.add_argument("--agents", nargs="+", required=False, default=["stupid_greedy","thief","astar"], help="List of agent types")
     ap.add_argument("--starts", nargs="+", required=False, default=["1","1","1"], help="Starting vertices for each agent (1-indexed)")
     ap.add_argument("--limit", type=int, default=10000, help="A* expansion limit")
+    ap.add_argument("--bidir", action="store_true", help="A*: search bidirectionally while no kit is in play")
     ap.add_argument("--L", type=int, default=10, help="RTA* expansions per decision")
+    ap.add_argument("--batch", type=int, default=1, help="RTA*: frontier entries expanded per round (1 = best-first)")
+    ap.add_argument("--beam", type=int, default=None, help="RTA*: keep only this many best frontier entries per round")
     ap.add_argument("--T", type=float, default=0.0, help="Per-expansion time (situated planning)")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     world, g = parse_world_from_file(args.input)
+    # Build the CSR arrays up front so the first agent decision doesn't pay for it.
+    # A cached parse shares its Graph with earlier runs: keep its CSR, since the
+    # successor cache and World._edge_costs are keyed on that indptr.
+    if world.graph.indptr is None:
+        world.graph.finalize()
 
     agents = []
     policies = []
@@ -69,20 +78,25 @@ def main():
         if kind not in AGENT_TYPES:
             raise SystemExit(f"Unknown agent type: {kind}")
         if kind == "astar":
-            inst = AGENT_TYPES[kind](LIMIT=args.limit)
+            inst = AGENT_TYPES[kind](LIMIT=args.limit, bidirectional=args.bidir)
         elif kind == "rta":
-            inst = AGENT_TYPES[kind](L=args.L)
+            inst = AGENT_TYPES[kind](L=args.L, batch=args.batch, beam=args.beam)
         else:
             inst = AGENT_TYPES[kind]()
         pos = int(args.starts[i]) if i < len(args.starts) else 1
-        astate = AgentState(name=f"A{i+1}", agent_type=kind, pos=pos, internal={"others": [], "terminated": False})
+        if not 1 <= pos <= world.graph.n:
+            raise SystemExit(f"Start vertex {pos} for agent A{i+1} is not in 1..{world.graph.n}")
+        astate = AgentState(name=f"A{i+1}", agent_type=kind, pos=pos, internal={"terminated": False})
         astate.internal["T"] = args.T
         agents.append(astate)
         policies.append(inst)
 
+    # One shared position table; agents that care about the others (the thief)
+    # read it through their own index instead of getting a fresh copy per action.
+    agents_pos = [a.pos for a in agents]
     for i,a in enumerate(agents):
-        others = [b.pos for j,b in enumerate(agents) if j!=i]
-        a.internal["others"] = others
+        a.internal["positions"] = agents_pos
+        a.internal["index"] = i
 
     # Pick up people at initial positions
     for a in agents:
@@ -127,18 +141,17 @@ def main():
             world.do_action(a, action)
             
             # Pick up people if agent moved to new location
-            before = sum(world.people.values())
+            before = world.total_people()
             if action[0] == TRAVERSE and a.pos != old_pos:
                 world.pick_up_people(a)
-            after = sum(world.people.values())
+            after = world.total_people()
             if after < before:
                 progressed = True
             
             # Update ALL agents' knowledge of other positions
-            for j, b in enumerate(agents):
-                b.internal["others"] = [c.pos for idx, c in enumerate(agents) if idx != j]
+            agents_pos[i] = a.pos
             
-            progressed = progressed or (action[0] not in [NOOP, TERMINATE])
+            progressed = progressed or (action[0] not in IDLE_ACTIONS)
             world.recompute_scores(agents)
             print(fmt_world(world, agents))
             
@@ -156,7 +169,7 @@ def main():
             break
         
         # Check if all non-thief agents have terminated
-        non_thief_agents = [a for a in agents if a.agent_type != "thief"]
+        non_thief_agents = [a for a in agents if not a.is_thief]
         all_terminated = all(a.internal.get("terminated", False) for a in non_thief_agents)
         
         if all_terminated:
@@ -230,11 +243,12 @@ def main():
     print("-" * 50)
     
     # Find winner (only among rescue agents, not thieves)
-    rescue_agents = [a for a in agents if a.agent_type != "thief"]
+    rescue_agents = [a for a in agents if not a.is_thief]
     if rescue_agents:
         best = max(rescue_agents, key=lambda x: x.score)
         print(f"Winner: {best.name} ({best.agent_type}) with score {best.score:.2f}")
     print("="*60)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
\ No newline at end of file
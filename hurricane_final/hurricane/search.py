@@ -1,57 +1,109 @@
 #!/usr/bin/env python3
-from dataclasses import dataclass
-from typing import Tuple, List, Dict, Set
-from .world import TRAVERSE, EQUIP, UNEQUIP, NOOP, TERMINATE
+from typing import Tuple, List, Dict, Set, Iterator, Optional, NamedTuple
+from .world import TRAVERSE, EQUIP, UNEQUIP, NOOP
 from .graph import Graph
-from .heuristic import admissible_heuristic
+from .heuristic import heuristic_for_mask
 import heapq, math
+from functools import lru_cache
 from itertools import count
 
-@dataclass(frozen=True)
-class SearchState:
+NON_MOVE_RANK = 10**9  # tie-break rank of actions that don't move (after every vertex id)
+
+def action_rank(action: Tuple[str, tuple]) -> int:
+    """
+    Tie-break rank of an action: the target vertex of a move (lower ids
+    first), NON_MOVE_RANK for anything that stays put.
+    """
+    kind, params = action
+    return params[0] if kind == TRAVERSE else NON_MOVE_RANK
+
+def bits_of(mask: int) -> List[int]:
+    """Vertex ids whose bit (1 << v) is set in mask, ascending."""
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+class SearchState(NamedTuple):
     pos: int
     equipped: bool
-    people: frozenset   # of (vertex,count>0)
-    kits: frozenset     # of vertex ids
+    people_mask: int    # bit v set <=> people still waiting at vertex v
+    kits_mask: int      # bit v set <=> a kit lies at vertex v
 
     def targets(self) -> List[int]:
-        return [v for v,c in self.people if c > 0]
+        return bits_of(self.people_mask)
+
+def make_successors(graph: Graph, P: int, Q: int, U: int):
+    """
+    Successor function specialized for one (graph, P, Q, U). Q, U and the
+    graph's per-kit-state CSR arrays (Graph.csr_by_equipped) are bound once
+    as closure cells, so a search calls succ(state) with no per-expansion attribute or
+    argument lookups for them. succ is a generator: callers iterate it once.
+    """
+    csr = graph.csr_by_equipped(P)
 
-def normalize_people(d: Dict[int,int]) -> frozenset:
-    return frozenset((v,c) for v,c in d.items() if c>0)
+    def succ(state: SearchState) -> Iterator[Tuple[float, Tuple[str, tuple], SearchState]]:
+        pos = state.pos
+        amph = state.equipped
+        people = state.people_mask
+        kits = state.kits_mask
 
-def normalize_kits(s: Set[int]) -> frozenset:
-    return frozenset(sorted(s))
+        if (not amph) and (kits >> pos) & 1:
+            yield Q, (EQUIP, ()), SearchState(pos, True, people, kits & ~(1 << pos))
 
-def successors(graph: Graph, P: int, state: SearchState) -> List[Tuple[float, Tuple[str, tuple], SearchState]]:
-    pos = state.pos
-    amph = state.equipped
-    res = []
+        if amph:
+            yield U, (UNEQUIP, ()), SearchState(pos, False, people, kits | (1 << pos))
 
-    if (not amph) and (pos in state.kits):
-        newkits = set(state.kits); newkits.remove(pos)
-        res.append((world_globals["Q"], (EQUIP, ()), SearchState(pos, True, state.people, normalize_kits(newkits))))
+        # walk only the CSR slots passable in this kit state
+        indptr, indices, weights, edge_ids = csr[amph]
+        for i in range(indptr[pos], indptr[pos+1]):
+            v = indices[i]
+            # arriving at v picks up whoever is there: one bit cleared, nothing rebuilt
+            ns = SearchState(v, amph, people & ~(1 << v), kits)
+            yield weights[i], (TRAVERSE, (v, edge_ids[i])), ns
 
-    if amph:
-        newkits = set(state.kits); newkits.add(pos)
-        res.append((world_globals["U"], (UNEQUIP, ()), SearchState(pos, False, state.people, normalize_kits(newkits))))
+        # waiting changes nothing, so the state itself is its successor
+        yield 1.0, (NOOP, ()), state
 
-    for v,e in graph.neighbors(pos):
-        if (not amph) and e.flooded:
-            continue
-        cost = e.w * (P if amph else 1)
-        newp = {vv: cc for vv,cc in state.people}
-        if newp.get(v, 0) > 0:
-            newp[v] = 0
-        ns = SearchState(v, amph, normalize_people(newp), state.kits)
-        res.append((cost, (TRAVERSE, (v, e.id)), ns))
+    return succ
 
-    res.append((1.0, (NOOP, ()), SearchState(pos, amph, state.people, state.kits)))
-    return res
+SUCC_CACHE_SIZE = 200_000  # successor lists kept across searches
 
-world_globals = {"Q": 0, "U": 0}
+_succ_owner = None  # (graph, CSR indptr, P, Q, U) _succ_fn was built for
+_succ_fn = None
 
-def greedy_one_step(graph: Graph, P: int, start: SearchState):
+def cached_successors(graph: Graph, P: int, Q: int, U: int):
+    """
+    make_successors(graph, P, Q, U) behind an lru_cache that outlives a single
+    search. Within one search every state is expanded once, but agents re-plan
+    each step from states the previous search already expanded. The
+    generator is materialized into a tuple so the cached copy can be shared. The cache is rebuilt when
+    the graph is re-finalized (edge added, flooding changed) or P/Q/U change.
+    """
+    global _succ_owner, _succ_fn
+    if graph.indptr is None:
+        graph.finalize()
+    o = _succ_owner
+    if o is None or o[0] is not graph or o[1] is not graph.indptr or o[2:] != (P, Q, U):
+        base = make_successors(graph, P, Q, U)
+        _succ_fn = lru_cache(maxsize=SUCC_CACHE_SIZE)(lambda state: tuple(base(state)))
+        _succ_owner = (graph, graph.indptr, P, Q, U)
+    return _succ_fn
+
+def make_heuristic(graph: Graph, P: int):
+    """
+    heuristic_for_mask for one search, keyed on (pos, people_mask): the bound
+    ignores the kit state, so states differing only in equipped / kits share
+    an entry. Each distinct key is evaluated once per search.
+    """
+    @lru_cache(maxsize=None)
+    def H(pos: int, people_mask: int) -> float:
+        return heuristic_for_mask(graph, pos, people_mask, P)
+    return H
+
+def greedy_one_step(graph: Graph, P: int, Q: int, U: int, start: SearchState):
     """
     Local Greedy Search (1-step lookahead):
     1. Generate all immediate successors.
@@ -61,75 +113,135 @@ def greedy_one_step(graph: Graph, P: int, start: SearchState):
     Returns: ([action], expansions=1)
     """
     # Trivial goal test
-    if len(start.targets()) == 0:
+    if not start.people_mask:
         return [], 0
         
+    succ = cached_successors(graph, P, Q, U)
     candidates = []
-    for cost, action, ns in successors(graph, P, start):
+    for cost, action, ns in succ(start):
         # Ignore NOOP in greedy search (prevents infinite loops when stuck)
-        if action[0] == NOOP:
+        kind = action[0]
+        if kind == NOOP:
             continue
-            
-        h = admissible_heuristic(graph, ns.pos, ns.targets(), ns.equipped, P)
-        candidates.append((h, action))
+        h = heuristic_for_mask(graph, ns.pos, ns.people_mask, P)
+        # Tie-break: min h, then min target vertex id (non-moves last). The key
+        # is stored in the tuple so min() compares it in C; parallel edges to
+        # the same vertex fall through to the action, i.e. the lower edge id.
+        v_id = action[1][0] if kind == TRAVERSE else NON_MOVE_RANK
+        candidates.append((h, v_id, action))
         
     if not candidates:
         return [], 1
         
-    # Tie-break: min h, then min vertex ID in action params
-    def tiebreaker(item):
-        h_val, act = item
-        kind, params = act
-        # Prefer moves that progress to lower to_v as a mild, stable tiebreak
-        v_id = 10**9
-        if kind == TRAVERSE and isinstance(params, tuple) and len(params) >= 1:
-            v_id = params[0]
-        return (h_val, v_id)
-        
-    best_h, best_action = min(candidates, key=tiebreaker)
+    best_h, _, best_action = min(candidates)
     
     # If best_h is infinite, we are stuck
-    if best_h == float('inf'):
+    if best_h == math.inf:
         return [], 1
         
     return [best_action], 1
 
-def a_star(graph: Graph, P: int, start: SearchState, LIMIT: int = 10000):
+# Inside the A* kernel an action is a small int: EQUIP / UNEQUIP / NOOP are
+# the codes below, TRAVERSE along CSR slot i of kit state e is i << 3 | e << 2.
+# Plans are unpacked back to (kind, params) actions only once a goal is found.
+_EQUIP_CODE, _UNEQUIP_CODE, _NOOP_CODE = 1, 2, 3
+_CODE_ACTIONS = {_EQUIP_CODE: (EQUIP, ()), _UNEQUIP_CODE: (UNEQUIP, ()), _NOOP_CODE: (NOOP, ())}
+
+def a_star(graph: Graph, P: int, Q: int, U: int, start: SearchState, LIMIT: int = 10000):
+    return _a_star_kernel(graph.csr_by_equipped(P), Q, U,
+                          (start.pos, start.equipped, start.people_mask, start.kits_mask),
+                          make_heuristic(graph, P), LIMIT)
+
+def _unpack_action(csr: Tuple[tuple, tuple], code: int) -> Tuple[str, tuple]:
+    if code & 3:
+        return _CODE_ACTIONS[code]
+    _, indices, _, edge_ids = csr[code >> 2 & 1]
+    i = code >> 3
+    return (TRAVERSE, (indices[i], edge_ids[i]))
+
+def _a_star_kernel(csr: Tuple[tuple, tuple], Q: int, U: int,
+                   start: Tuple[int, bool, int, int], H, LIMIT: int):
+    """
+    A* on the per-kit-state CSR arrays (Graph.csr_by_equipped) over plain
+    (pos, equipped, people_mask, kits_mask) tuples: hashing and equality are
+    C tuple/int operations, with no SearchState objects or Python-level
+    __hash__/__eq__ calls. Successors are generated inline in the same order
+    as make_successors, so plans and expansion counts match a search over
+    SearchState objects.
+    """
+    pop = heapq.heappop; push = heapq.heappush
     cnt = 0
-    frontier = []
-    gscore = {start: 0.0}
-    parent = {start: (None, None)}
+    # States are interned to dense ids on first sight and everything else is
+    # indexed by id, so each distinct state is hashed exactly once.
+    id_of: Dict[Tuple[int, bool, int, int], int] = {start: 0}
+    states: List[Tuple[int, bool, int, int]] = [start]
+    gscore: List[float] = [0.0]
+    parent: List[int] = [-1]    # predecessor id
+    via: List[int] = [0]        # action code from parent
+    closed = bytearray(1)       # closed[id] == 1 once the state was expanded
     tie = count()
-    f0 = admissible_heuristic(graph, start.pos, start.targets(), start.equipped, P)
-    heapq.heappush(frontier, (f0, next(tie), 0.0, start))
-    expanded = set()
+    f0 = H(start[0], start[2])
+    frontier = [(f0, next(tie), 0.0, 0)]
     while frontier:
-        f, _, g, s = heapq.heappop(frontier)
-        if s in expanded:
+        f, _, g, sid = pop(frontier)
+        # Each state is expanded at most once, by its first entry to pop.
+        # A g check alone is not enough: states that cannot reach every
+        # target have h = inf and pop in push order rather than by g.
+        if closed[sid]:
             continue
-        expanded.add(s)
+        closed[sid] = 1
         cnt += 1
         if cnt > LIMIT:
             return [], cnt
-        if len(s.targets()) == 0:
-            path = []
-            cur = s
-            while parent[cur][0] is not None:
-                prev, action = parent[cur]
-                path.append(action)
-                cur = prev
-            path.reverse()
+        s = states[sid]
+        pos, amph, people, kits = s
+        if not people:
+            # walk the id chain once for its length, then fill the plan back to front
+            n = 0
+            cur = sid
+            while parent[cur] != -1:
+                n += 1
+                cur = parent[cur]
+            path = [None] * n
+            while n:
+                n -= 1
+                path[n] = _unpack_action(csr, via[sid])
+                sid = parent[sid]
             return path, cnt
-        for cost, action, ns in successors(graph, P, s):
+        succ = []
+        if not amph and (kits >> pos) & 1:
+            succ.append((Q, _EQUIP_CODE, (pos, True, people, kits & ~(1 << pos))))
+        if amph:
+            succ.append((U, _UNEQUIP_CODE, (pos, False, people, kits | (1 << pos))))
+        indptr, indices, weights, _ = csr[amph]
+        tag = 4 if amph else 0
+        for i in range(indptr[pos], indptr[pos+1]):
+            v = indices[i]
+            # arriving at v picks up whoever is there
+            succ.append((weights[i], i << 3 | tag, (v, amph, people & ~(1 << v), kits)))
+        succ.append((1.0, _NOOP_CODE, s))
+        for cost, code, ns in succ:
             ng = g + cost
-            if ng < gscore.get(ns, math.inf):
-                gscore[ns] = ng
-                parent[ns] = (s, action)
-                h = admissible_heuristic(graph, ns.pos, ns.targets(), ns.equipped, P)
-                heapq.heappush(frontier, (ng + h, next(tie), ng, ns))
+            nid = id_of.get(ns)
+            if nid is None:
+                nid = id_of[ns] = len(states)
+                states.append(ns)
+                gscore.append(ng)
+                parent.append(sid)
+                via.append(code)
+                closed.append(0)
+            elif ng < gscore[nid]:
+                gscore[nid] = ng
+                parent[nid] = sid
+                via[nid] = code
+            else:
+                continue
+            h = H(ns[0], ns[2])
+            push(frontier, (ng + h, next(tie), ng, nid))
     return [], cnt
 
-def rta_star(graph: Graph, P: int, start: SearchState, L: int = 10):
+def rta_star(graph: Graph, P: int, Q: int, U: int, start: SearchState, L: int = 10,
+             batch: int = 1, beam: Optional[int] = None):
     """
     Real-Time A* (RT-A*):
       - Search up to L expansions starting from `start`.
@@ -137,13 +249,22 @@ def rta_star(graph: Graph, P: int, start: SearchState, L: int = 10):
         encountered along any path within the depth-limited search that BEGINS with that action.
       - If a goal is found within the lookahead, return the full plan to it.
       - Otherwise, execute the immediate action whose best f is minimal (ties -> smaller vertex id).
+    batch > 1 pops up to `batch` frontier entries per round and expands them
+    together (best-k instead of strict best-first); beam, if given, trims the
+    frontier to its `beam` best entries after every round. The defaults
+    (batch=1, no beam) are plain best-first RT-A*. Without a beam the
+    frontier is still bounded: L expansions push at most L * (max degree + 2)
+    entries on top of the seeds.
     Returns: (plan, expansions) where `plan` is either a full plan to goal or a single action.
     """
     # Trivial goal test first
-    if len(start.targets()) == 0:
+    if not start.people_mask:
         return [], 0
 
+    succ = cached_successors(graph, P, Q, U)
+    H = make_heuristic(graph, P)
     # Priority queue entries: (f, tie, g, state, first_action)
+    pop = heapq.heappop; push = heapq.heappush
     tie = count()
     expansions = 0
     expanded: Set[SearchState] = set()
@@ -153,43 +274,57 @@ def rta_star(graph: Graph, P: int, start: SearchState, L: int = 10):
     frontier = []
     best_f_by_action: Dict[Tuple[str, tuple], float] = {}
 
-    for cost, action, ns in successors(graph, P, start):
+    for cost, action, ns in succ(start):
         g0 = cost
-        h0 = admissible_heuristic(graph, ns.pos, ns.targets(), ns.equipped, P)
+        h0 = H(ns.pos, ns.people_mask)
         f0 = g0 + h0
         best_f_by_action[action] = f0
         if ns != start:
             parent[ns] = (start, action)
-        heapq.heappush(frontier, (f0, next(tie), g0, ns, action))
+        frontier.append((f0, next(tie), g0, ns, action))
+    heapq.heapify(frontier)
 
     goal_state = None
 
+    # The lookahead stays in-process and sequential: a whole decision at the
+    # usual L ~ 10 costs less than one round trip to a worker process.
     while frontier and expansions < L:
-        f, _, g, s, first_action = heapq.heappop(frontier)
-        if s in expanded:
-            continue
-        expanded.add(s)
-        expansions += 1
+        popped = []
+        while frontier and len(popped) < batch and expansions + len(popped) < L:
+            entry = pop(frontier)
+            s = entry[3]
+            if s in expanded:
+                continue
+            expanded.add(s)
+            popped.append(entry)
+
+        for f, _, g, s, first_action in popped:
+            expansions += 1
 
-        # Update best seen f for this first_action
-        if f < best_f_by_action.get(first_action, float("inf")):
-            best_f_by_action[first_action] = f
+            # Update best seen f for this first_action
+            if f < best_f_by_action.get(first_action, math.inf):
+                best_f_by_action[first_action] = f
 
-        # Goal?
-        if len(s.targets()) == 0:
-            goal_state = s
+            # Goal?
+            if not s.people_mask:
+                goal_state = s
+                break
+
+            # Expand successors
+            for cost, action, ns in succ(s):
+                ng = g + cost
+                h = H(ns.pos, ns.people_mask)
+                nf = ng + h
+                if ns not in expanded:
+                    # Preserve the first action that led away from the root
+                    if ns != s:
+                        parent[ns] = (s, action)
+                    push(frontier, (nf, next(tie), ng, ns, first_action))
+        if goal_state is not None:
             break
 
-        # Expand successors
-        for cost, action, ns in successors(graph, P, s):
-            ng = g + cost
-            h = admissible_heuristic(graph, ns.pos, ns.targets(), ns.equipped, P)
-            nf = ng + h
-            if ns not in expanded:
-                # Preserve the first action that led away from the root
-                if ns != s:
-                    parent[ns] = (s, action)
-                heapq.heappush(frontier, (nf, next(tie), ng, ns, first_action))
+        if beam is not None and len(frontier) > beam:
+            frontier = heapq.nsmallest(beam, frontier)  # sorted, hence still a heap
 
     # If we found a goal within the lookahead, return full plan to it
     if goal_state is not None:
@@ -214,7 +349,7 @@ def rta_star(graph: Graph, P: int, start: SearchState, L: int = 10):
 
     # Check if all f-values are infinite (no path to goal exists)
     best_f = min(best_f_by_action.values())
-    if best_f == float('inf') or best_f >= 1e9:
+    if best_f == math.inf or best_f >= 1e9:
         # All paths lead nowhere - terminate
         return [], expansions
 
@@ -222,15 +357,7 @@ def rta_star(graph: Graph, P: int, start: SearchState, L: int = 10):
     # Only NOOP available and it doesn't lead to goal
         return [], expansions
 
-    # Tie-break by lexical/min id via action's parameter if equal f
-    # (Actions are tuples like (TRAVERSE, (to_v, eid)) or (EQUIP, ()), etc.)
-    def action_tiebreak(a):
-        kind, params = a
-        # Prefer moves that progress to lower to_v as a mild, stable tiebreak
-        if kind == TRAVERSE and isinstance(params, tuple) and len(params) >= 1:
-            return params[0]
-        return 10**9  # neutral fallback
-
+    # Tie-break by min target vertex id if equal f
     candidates = [a for a, f in best_f_by_action.items() if f == best_f]
-    chosen = sorted(candidates, key=action_tiebreak)[0]
-    return [chosen], expansions
\ No newline at end of file
+    chosen = min(candidates, key=action_rank)
+    return [chosen], expansions
@@ -126,6 +126,194 @@ def test_flooded_with_kit():
     
     print("✓ Test 4 passed\n")
 
+def test_unknown_edge_id():
+    """Test: Traversing an edge id that does not exist."""
+    print("Test 5: Unknown edge id raises KeyError")
+    content = """#N 3
+#U 1
+#Q 2
+#P 3
+#V1 B
+#V2 B
+#V3 P5
+#E1 1 2 W1
+#E2 2 3 W1
+"""
+    with open("test_edge_id.txt", "w") as f:
+        f.write(content)
+    
+    from .world import parse_world_from_file, TRAVERSE
+    from .agents import AgentState
+    
+    world, _ = parse_world_from_file("test_edge_id.txt")
+    agent = AgentState("A1", "stupid_greedy", pos=1)
+    
+    # -1 must not wrap around to the last edge, 0 and 3 are not edge ids
+    for eid in (-1, 0, 3):
+        try:
+            world.do_action(agent, (TRAVERSE, (2, eid)))
+        except KeyError:
+            pass
+        else:
+            assert False, f"Edge {eid} should raise KeyError"
+    assert agent.pos == 1 and world.time == 0, "Failed traversals must not move the agent"
+    print("✓ Test 5 passed\n")
+
+# Bundled maps without kits: every target reachable / some target cut off
+KIT_FREE_MAPS = ["hurricane/examples/two_people_far.txt", "test_06_comparison.txt",
+                 "test_07_rta.txt", "test_14_limit.txt"]
+UNREACHABLE_MAPS = ["test_03_unreachable.txt", "test_12_partial.txt"]
+
+def _run_plan(path, start, plan):
+    """Execute plan on a fresh copy of the map; returns (time spent, people left)."""
+    from .world import parse_world_from_file, TRAVERSE
+    from .agents import AgentState
+    
+    world, _ = parse_world_from_file(path)
+    agent = AgentState("A1", "astar", pos=start)
+    world.pick_up_people(agent)
+    for action in plan:
+        world.do_action(agent, action)
+        if action[0] == TRAVERSE:
+            world.pick_up_people(agent)
+    return world.time, world.total_people()
+
+def test_bidir_astar_matches_a_star():
+    """Test: Vertex-level bidirectional A* finds the optimal cost to each target."""
+    print("Test 6: bidir_astar plan costs match a_star / Dijkstra")
+    from .world import parse_world_from_file
+    from .search import SearchState, a_star
+    from .bidir_astar import bidir_astar
+    
+    for path in KIT_FREE_MAPS + UNREACHABLE_MAPS:
+        world, _ = parse_world_from_file(path)
+        g = world.graph
+        if g.indptr is None:
+            g.finalize()
+        for t in sorted(world.people):
+            plan, _ = bidir_astar(g, world.P, 1, t)
+            ref, _ = a_star(g, world.P, world.Q, world.U, SearchState(1, False, 1 << t, 0))
+            if not ref:
+                assert plan == [], f"{path}: V{t} is unreachable, got {plan}"
+                continue
+            assert plan, f"{path}: no plan to V{t}"
+            cost, _ = _run_plan(path, 1, plan)
+            ref_cost, _ = _run_plan(path, 1, ref)
+            assert cost == ref_cost, f"{path}: cost {cost} to V{t}, a_star {ref_cost}"
+            assert plan[-1][1][0] == t, f"{path}: plan to V{t} ends at {plan[-1][1][0]}"
+    
+    # amphibious mode crosses flooded edges at w*P, like an equipped Dijkstra
+    for path in ["test_04_flooded_kit.txt", "test_03_unreachable.txt"]:
+        world, _ = parse_world_from_file(path)
+        g = world.graph
+        dist = g.dijkstra_dists(1, amphib=True, P=world.P)
+        for t in sorted(world.people):
+            plan, _ = bidir_astar(g, world.P, 1, t, amphib=True)
+            if dist[t] == float("inf"):
+                assert plan == [], f"{path}: V{t} is unreachable, got {plan}"
+                continue
+            cost = sum(g.edges[eid].w * world.P for _, (_, eid) in plan)
+            assert cost == dist[t], f"{path}: amphibious cost {cost} to V{t}, Dijkstra {dist[t]}"
+    print("✓ Test 6 passed\n")
+
+def test_a_star_bidir_matches_a_star():
+    """Test: State-space bidirectional A* finds a_star's cost for all targets."""
+    print("Test 7: a_star_bidir plan costs match a_star")
+    from .world import parse_world_from_file
+    from .search import SearchState, a_star
+    from .bidir_astar import a_star_bidir
+    
+    for path in KIT_FREE_MAPS + UNREACHABLE_MAPS:
+        world, _ = parse_world_from_file(path)
+        s0 = SearchState(1, False, world.people_mask() & ~(1 << 1), world.kits_mask())
+        plan, _ = a_star_bidir(world.graph, world.P, world.Q, world.U, s0)
+        ref, _ = a_star(world.graph, world.P, world.Q, world.U, s0)
+        if path in UNREACHABLE_MAPS:
+            assert plan == [] and ref == [], f"{path}: expected no plan, got {plan}"
+            continue
+        cost, left = _run_plan(path, 1, plan)
+        ref_cost, _ = _run_plan(path, 1, ref)
+        assert left == 0, f"{path}: plan leaves {left} people behind"
+        assert cost == ref_cost, f"{path}: cost {cost}, a_star {ref_cost}"
+    print("✓ Test 7 passed\n")
+
+def test_rta_batch_and_beam():
+    """Test: RTA* with batched expansion and a beam still rescues everyone."""
+    print("Test 8: RTA* batch / beam plans")
+    from .world import parse_world_from_file, TRAVERSE, TERMINATE
+    from .agents import RealTimeAStarAgent, AgentState
+    
+    for path in ["test_07_rta.txt", "test_14_limit.txt", "test_06_comparison.txt"]:
+        for batch, beam in [(1, None), (3, None), (1, 4), (2, 6)]:
+            world, _ = parse_world_from_file(path)
+            agent = AgentState("A1", "rta", pos=1)
+            policy = RealTimeAStarAgent(L=10, batch=batch, beam=beam)
+            world.pick_up_people(agent)
+            for _ in range(200):
+                action = policy(world, agent)
+                if action[0] == TERMINATE:
+                    break
+                world.do_action(agent, action)
+                if action[0] == TRAVERSE:
+                    world.pick_up_people(agent)
+            assert world.total_people() == 0, \
+                f"{path} batch={batch} beam={beam}: {world.total_people()} people left"
+    print("✓ Test 8 passed\n")
+
+def test_parse_cache_invalidation():
+    """Test: Rewriting an input file forces a fresh parse."""
+    print("Test 9: Parse cache follows file changes")
+    import os
+    content = """#N 2
+#U 1
+#Q 2
+#P 3
+#V1 B
+#V2 P{}
+#E1 1 2 W{}
+"""
+    path = "test_parse_cache.txt"
+    with open(path, "w") as f:
+        f.write(content.format(2, 5))
+    
+    from .world import parse_world_from_file
+    
+    w1, _ = parse_world_from_file(path)
+    w2, _ = parse_world_from_file(path)
+    assert w2.graph is w1.graph, "Unchanged file should reuse the parsed graph"
+    w1.people.clear()
+    assert w2.people == {2: 2}, "Each parse must hand out its own people"
+    
+    # different size
+    with open(path, "w") as f:
+        f.write(content.format(2, 50))
+    w3, _ = parse_world_from_file(path)
+    assert w3.graph is not w1.graph and w3.graph.edges[1].w == 50, "Resized file was not re-parsed"
+    
+    # same size, new mtime
+    with open(path, "w") as f:
+        f.write(content.format(7, 50))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    w4, _ = parse_world_from_file(path)
+    assert w4.people == {2: 7}, "Rewritten file was not re-parsed"
+    print("✓ Test 9 passed\n")
+
+def test_start_out_of_range():
+    """Test: A start vertex outside 1..#N is rejected up front."""
+    print("Test 10: Out-of-range start vertex")
+    from .run import main
+    
+    for start in ("4", "0"):
+        for kind in ("stupid_greedy", "thief", "astar", "rta", "greedy_search"):
+            try:
+                main(["--input", "test_01_start.txt", "--agents", kind, "--starts", start])
+            except SystemExit as e:
+                assert "not in 1..3" in str(e.code), f"Unexpected message: {e.code}"
+            else:
+                assert False, f"{kind} starting at V{start} should be rejected"
+    print("✓ Test 10 passed\n")
+
 if __name__ == "__main__":
     print("="*60)
     print("RUNNING EDGE CASE TESTS")
@@ -135,6 +323,12 @@ if __name__ == "__main__":
     test_unreachable_people()
     test_no_people()
     test_flooded_with_kit()
+    test_unknown_edge_id()
+    test_bidir_astar_matches_a_star()
+    test_a_star_bidir_matches_a_star()
+    test_rta_batch_and_beam()
+    test_parse_cache_invalidation()
+    test_start_out_of_range()
     
     print("="*60)
     print("ALL TESTS PASSED ✓")
@@ -1,64 +1,69 @@
 def shuffle_playlist(playlist):
-    from collections import defaultdict
+    # Intern artists to ints; the scheduling loop only ever sees the ids
+    ids = {}
+    artist_ids = [ids.setdefault(artist, len(ids)) for title, artist in playlist]
+    return [[playlist[idx][0], playlist[idx][1]] for idx in _shuffle_order(artist_ids, len(ids))]
+
+
+def _shuffle_order(artist_ids, n_artists):
+    """Play order (song indices) for songs given by artist id, ints only."""
     import heapq
     
-    # Group songs by artist with original indices
-    artist_songs = defaultdict(list)
-    for idx, (title, artist) in enumerate(playlist):
-        artist_songs[artist].append((idx, title))
-    
-    # Max heap: (-remaining_songs, first_song_original_idx, artist, current_pos)
-    # Negative remaining_songs for max heap behavior
-    heap = []
-    for artist, songs in artist_songs.items():
-        heapq.heappush(heap, (-len(songs), songs[0][0], artist, 0))
-    
-    result = []
-    last_artist = None
-    temp_storage = None  # Temporarily hold artist if same as last
-    
-    while heap or temp_storage:
-        # If heap is empty but we have stored artist, it must be the last one
-        if not heap and temp_storage:
-            heap = [temp_storage]
-            temp_storage = None
-        
-        # Pop highest priority artist
-        neg_remaining, first_idx, artist, pos = heapq.heappop(heap)
+    n = len(artist_ids)
+    # Group songs by artist: first song index and song count per artist, and
+    # for every song the index of that artist's next song (-1 after the last)
+    first = [-1] * n_artists
+    count = [0] * n_artists
+    next_song = [-1] * n
+    last_seen = [-1] * n_artists
+    for idx, a in enumerate(artist_ids):
+        if last_seen[a] < 0:
+            first[a] = idx
+        else:
+            next_song[last_seen[a]] = idx
+        count[a] += 1
+        last_seen[a] = idx
+    
+    # Priority (most remaining songs, then earliest next song) packed into one
+    # int so the heap compares plain ints instead of tuples:
+    #   key = (n - remaining) * n + next_song_idx
+    # Song indices are unique, so a key also identifies its artist.
+    heap = [(n - count[a]) * n + first[a] for a in range(n_artists)]
+    heapq.heapify(heap)
+    pop = heapq.heappop; push = heapq.heappush; replace = heapq.heapreplace
+    
+    order = []
+    last_artist = -1
+    
+    while heap:
+        key = pop(heap)
+        idx = key % n
         
-        # If same as last artist and we have other options
-        if artist == last_artist and heap:
-            # Store this artist temporarily
-            temp_storage = (neg_remaining, first_idx, artist, pos)
-            continue
-        
-        # If we had a stored artist and current is different, push stored back
-        if temp_storage and temp_storage[2] != artist:
-            heapq.heappush(heap, temp_storage)
-            temp_storage = None
+        # Same artist as last time and someone else can play: take the best
+        # other artist and put this one back, in one heap operation
+        if artist_ids[idx] == last_artist and heap:
+            key = replace(heap, key)
+            idx = key % n
         
         # Play the song
-        original_idx, title = artist_songs[artist][pos]
-        result.append([title, artist])
-        last_artist = artist
-        
-        # Update: move to next song for this artist
-        pos += 1
-        remaining = len(artist_songs[artist]) - pos
+        order.append(idx)
+        last_artist = artist_ids[idx]
         
-        # If artist has more songs, push back to heap
-        if remaining > 0:
-            next_first_idx = artist_songs[artist][pos][0]
-            heapq.heappush(heap, (-remaining, next_first_idx, artist, pos))
+        # One song fewer (+n), next song of the same artist replaces idx
+        nxt = next_song[idx]
+        if nxt >= 0:
+            push(heap, key + n - idx + nxt)
     
-    return result
+    return order
+
 
+_BAR = "=" * 80
 
 # COMPREHENSIVE TEST SUITE
 def run_all_tests():
-    print("=" * 80)
+    print(_BAR)
     print("TESTING OPTIMIZED O(n log m) SOLUTION")
-    print("=" * 80)
+    print(_BAR)
     
     # Test 1: Original Example
     print("\nTEST 1: Original Example")
@@ -192,8 +197,9 @@ def run_all_tests():
     ]
     print("✓ PASS" if result13 == expected13 else "✗ FAIL")
     
-    print("\n" + "=" * 80)
+    print("\n" + _BAR)
     print("ALL TESTS COMPLETED!")
-    print("=" * 80)
+    print(_BAR)
 
-run_all_tests()
\ No newline at end of file
+if __name__ == "__main__":
+    run_all_tests()
\ No newline at end of file
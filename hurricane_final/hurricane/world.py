@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 from .graph import Graph, Edge
+import math, os, sys
 
-TRAVERSE = "traverse"  # params: (to_vertex, edge_id)
-EQUIP = "equip"
-UNEQUIP = "unequip"
-NOOP = "no-op"
-TERMINATE = "terminate"
+TRAVERSE = sys.intern("traverse")  # params: (to_vertex, edge_id)
+EQUIP = sys.intern("equip")
+UNEQUIP = sys.intern("unequip")
+NOOP = sys.intern("no-op")  # not identifier-like, so not interned by the compiler
+TERMINATE = sys.intern("terminate")
+# Action kinds stay interned str constants: agents and tests compare against
+# the literal names. Kinds are compared with ==, never `is`, so an equal string
+# from any policy works; on the constants themselves == is a pointer check.
+IDLE_ACTIONS = frozenset((NOOP, TERMINATE))  # kinds that make no progress
 
-@dataclass
+@dataclass(slots=True)
 class AgentState:
     name: str
     agent_type: str
@@ -19,8 +24,12 @@ class AgentState:
     saved: int = 0
     score: float = 0.0
     internal: dict = field(default_factory=dict)
+    is_thief: bool = field(default=False, init=False, repr=False)  # agent_type == "thief"
 
-@dataclass
+    def __post_init__(self):
+        self.is_thief = self.agent_type == "thief"
+
+@dataclass(slots=True)
 class World:
     graph: Graph
     Q: int
@@ -29,87 +38,196 @@ class World:
     people: Dict[int, int]
     kits: Set[int]
     time: float = 0.0
+    # Bumped on every change to people / kits, so the bitmasks handed to
+    # the search are rebuilt only when something actually changed.
+    people_version: int = field(default=0, init=False, repr=False)
+    kits_version: int = field(default=0, init=False, repr=False)
+    _people_mask: Optional[Tuple[int, int]] = field(default=None, init=False, repr=False)
+    _kits_mask: Optional[Tuple[int, int]] = field(default=None, init=False, repr=False)
+    # Invariant: _people_total == sum(people.values()). Set from people at
+    # construction; pick_up_people is the only place people changes.
+    _people_total: int = field(default=0, init=False, repr=False)
+    # Kit bitmap, one byte per vertex id: _kits_bm[v] == 1 <=> v in kits.
+    # Kept in step with the kits set, which stays for iteration.
+    _kits_bm: bytearray = field(default_factory=bytearray, init=False, repr=False)
+    # (graph CSR the table was built from, traversal cost per edge id without
+    # a kit (inf if flooded), with a kit (w*P)); see _edge_costs()
+    _edge_cost: Optional[tuple] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self._people_total = sum(self.people.values())
+        bm = bytearray(max(self.graph.n, max(self.kits, default=0)) + 1)
+        for v in self.kits:
+            bm[v] = 1
+        self._kits_bm = bm
+
+    def has_kit(self, v: int) -> bool:
+        """Whether a kit lies at vertex v: one byte load, no hashing."""
+        return v < len(self._kits_bm) and self._kits_bm[v] == 1
 
     def total_people(self) -> int:
-        return sum(self.people.values())
+        return self._people_total
 
     def all_saved(self) -> bool:
-        return self.total_people() == 0
+        return self._people_total == 0
+
+    def people_mask(self) -> int:
+        """Bitmask with bit v set for every vertex v that still holds people."""
+        if self._people_mask is None or self._people_mask[0] != self.people_version:
+            m = 0
+            for v, c in self.people.items():
+                if c > 0:
+                    m |= 1 << v
+            self._people_mask = (self.people_version, m)
+        return self._people_mask[1]
+
+    def kits_mask(self) -> int:
+        if self._kits_mask is None or self._kits_mask[0] != self.kits_version:
+            m = 0
+            for v in self.kits:
+                m |= 1 << v
+            self._kits_mask = (self.kits_version, m)
+        return self._kits_mask[1]
+
+    def _edge_costs(self) -> Tuple[list, list]:
+        """Per-edge-id traversal cost tables (unequipped, equipped), indexed by edge id."""
+        g = self.graph
+        if g.indptr is None:
+            g.finalize()
+        ec = self._edge_cost
+        if ec is None or ec[0] is not g.indptr:
+            P = self.P
+            dry = [None if w is None else (math.inf if f else w) for w, f in zip(g.edge_w, g.edge_flooded)]
+            eq = [None if w is None else w * P for w in g.edge_w]
+            ec = self._edge_cost = (g.indptr, dry, eq)
+        return ec[1], ec[2]
 
     def can_traverse(self, a: AgentState, edge: Edge) -> bool:
         return (not edge.flooded) or a.equipped
 
     def pick_up_people(self, a: AgentState):
-        if a.agent_type == "thief":
+        if a.is_thief:
             return 0
-        count = self.people.get(a.pos, 0)
-        if count > 0:
+        # emptied vertices leave the dict; readers treat a missing vertex as 0
+        count = self.people.pop(a.pos, 0)
+        if count:
             a.saved += count
-            self.people[a.pos] = 0
+            self._people_total -= count
+            self.people_version += 1
             return count
         return 0
 
     def do_action(self, a: AgentState, action: Tuple[str, tuple]):
         kind, params = action
         a.actions += 1
-        if kind == TERMINATE:
-            return
-        if kind == NOOP:
+        handler = _ACTION_HANDLERS.get(kind)
+        if handler is None:
+            raise ValueError(f"Unknown action {kind}")
+        handler(self, a, params)
+
+    def _do_terminate(self, a: AgentState, params: tuple):
+        pass
+
+    def _do_noop(self, a: AgentState, params: tuple):
+        self.time += 1
+
+    def _do_equip(self, a: AgentState, params: tuple):
+        if (not a.equipped) and self.has_kit(a.pos):
+            self._kits_bm[a.pos] = 0
+            self.kits.remove(a.pos)
+            self.kits_version += 1
+            self.time += self.Q
+            a.equipped = True
+        else:
+            self.time += 1
+
+    def _do_unequip(self, a: AgentState, params: tuple):
+        if a.equipped:
+            self.time += self.U
+            a.equipped = False
+            if a.pos >= len(self._kits_bm):
+                self._kits_bm.extend(bytes(a.pos + 1 - len(self._kits_bm)))
+            self._kits_bm[a.pos] = 1
+            self.kits.add(a.pos)
+            self.kits_version += 1
+        else:
+            self.time += 1
+
+    def _do_traverse(self, a: AgentState, params: tuple):
+        to_v, edge_id = params
+        table = self._edge_costs()[a.equipped]
+        # unknown ids raise KeyError like graph.edges[edge_id]; a negative id
+        # must not wrap around to the end of the list
+        if not (0 <= edge_id < len(table)) or table[edge_id] is None:
+            raise KeyError(edge_id)
+        cost = table[edge_id]
+        if cost != math.inf:
+            self.time += cost
+            a.pos = to_v
+        else:
             self.time += 1
-            return
-        if kind == EQUIP:
-            if (a.pos in self.kits) and (not a.equipped):
-                self.kits.remove(a.pos)
-                self.time += self.Q
-                a.equipped = True
-            else:
-                self.time += 1
-            return
-        if kind == UNEQUIP:
-            if a.equipped:
-                self.time += self.U
-                a.equipped = False
-                self.kits.add(a.pos)
-            else:
-                self.time += 1
-            return
-        if kind == TRAVERSE:
-            to_v, edge_id = params
-            e = self.graph.edges[edge_id]
-            if self.can_traverse(a, e):
-                cost = e.w * (self.P if a.equipped else 1)
-                self.time += cost
-                a.pos = to_v
-            else:
-                self.time += 1
-            return
-        raise ValueError(f"Unknown action {kind}")
 
     def recompute_scores(self, agents: List['AgentState']):
+        t = self.time  # one attribute load for the whole pass
         for a in agents:
-            a.score = a.saved * 1000 - self.time
+            a.score = a.saved * 1000 - t
+
+# action kind -> World handler; one dict probe per action instead of an if-chain
+_ACTION_HANDLERS = {
+    TRAVERSE: World._do_traverse,
+    EQUIP: World._do_equip,
+    UNEQUIP: World._do_unequip,
+    NOOP: World._do_noop,
+    TERMINATE: World._do_terminate,
+}
+
+# (abspath, mtime_ns, size) -> (graph, Q, U, P, people, kits) as last parsed
+_WORLD_CACHE: Dict[Tuple[str, int, int], tuple] = {}
 
 def parse_world_from_file(path: str):
+    """
+    Parse an input file into (world, globals). Parses are memoized on the
+    file's path, mtime and size. A repeated call gets a fresh World with its
+    own people/kits/time around the same Graph, which simulations never
+    modify (they only read it and fill its search caches).
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    hit = _WORLD_CACHE.get(key)
+    if hit is None:
+        hit = _WORLD_CACHE[key] = _parse_world(path)
+    g, Q, U, P, people, kits = hit
+    world = World(graph=g, Q=Q, U=U, P=P, people=dict(people), kits=set(kits), time=0.0)
+    return world, {"N": g.n, "Q": Q, "U": U, "P": P}
+
+def _parse_world(path: str):
     with open(path, "r", encoding="utf-8") as f:
-        lines = [ln.strip() for ln in f if ln.strip() and not ln.strip().startswith(";")]
+        lines = []
+        for raw in f:
+            ln = raw.strip()  # once per line
+            if ln and not ln.startswith(";"):
+                lines.append(ln)
 
     n = None; Q=None; U=None; P=None
     people = {}
     kits = set()
     edges = []
     for ln in lines:
-        if ln.startswith("#N"):
-            n = int(ln.split()[1])
-        elif ln.startswith("#U"):
-            U = int(ln.split()[1])
-        elif ln.startswith("#Q"):
-            Q = int(ln.split()[1])
-        elif ln.startswith("#P"):
-            P = int(ln.split()[1])
-        elif ln.startswith("#V"):
-            parts = ln[2:].split()
-            vid = int(parts[0])
-            contents = parts[1:]
+        # split once; the first token's two-character prefix picks the record
+        tok = ln.split()
+        head = tok[0][:2]
+        if head == "#E":
+            eid = int(tok[0][2:])
+            u = int(tok[1]); v = int(tok[2])
+            w = int(tok[3][1:])
+            flooded = len(tok) > 4 and "F" in tok[4:]
+            edges.append((eid, u, v, w, flooded))
+        elif head == "#V":
+            # "#V3 P2 K" or "#V 3 P2 K"
+            if len(tok[0]) > 2:
+                vid = int(tok[0][2:]); contents = tok[1:]
+            else:
+                vid = int(tok[1]); contents = tok[2:]
             ppl = 0; has_k=False
             for c in contents:
                 if c.startswith("P"):
@@ -120,13 +238,14 @@ def parse_world_from_file(path: str):
                 people[vid] = ppl
             if has_k:
                 kits.add(vid)
-        elif ln.startswith("#E"):
-            parts = ln.split()
-            eid = int(parts[0][2:])
-            u = int(parts[1]); v = int(parts[2])
-            w = int(parts[3][1:])
-            flooded = ("F" in parts[4:])
-            edges.append((eid, u, v, w, flooded))
+        elif head == "#N":
+            n = int(tok[1])
+        elif head == "#U":
+            U = int(tok[1])
+        elif head == "#Q":
+            Q = int(tok[1])
+        elif head == "#P":
+            P = int(tok[1])
 
     assert None not in (n,Q,U,P), "Missing globals (#N,#U,#Q,#P)"
     from .graph import Graph
@@ -134,5 +253,4 @@ def parse_world_from_file(path: str):
     for eid,u,v,w,f in edges:
         g.add_edge(eid,u,v,w,f)
 
-    world = World(graph=g, Q=Q, U=U, P=P, people=people, kits=kits, time=0.0)
-    return world, {"N": n, "Q": Q, "U": U, "P": P}
+    return g, Q, U, P, people, frozenset(kits)
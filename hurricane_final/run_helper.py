@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 import sys
+import io
+import os
 import subprocess
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout
 
 # ==========================================
 # CONFIGURATION
@@ -12,7 +17,7 @@ AGENTS = ["astar"]
 
 # ==========================================
 
-def run_simulation(start_pos, test_file):
+def run_simulation(start_pos, test_file, use_subprocess=False):
     """
     Run the simulation with the configured agents.
     
@@ -21,6 +26,9 @@ def run_simulation(start_pos, test_file):
                                  If single int, applies to first agent (or all if broadcast).
                                  If list, must match length of AGENTS.
         test_file (str): Name of the input graph file.
+        use_subprocess (bool): Run in a fresh interpreter instead of calling
+                               hurricane.run.main in this one (isolates runs,
+                               but pays interpreter startup and imports each time).
     """
     
     # Handle start_pos being a single int or a list
@@ -29,23 +37,61 @@ def run_simulation(start_pos, test_file):
     else:
         starts = [str(s) for s in start_pos]
 
-    cmd = [
-        sys.executable, "-m", "hurricane.run",
+    cmd_args = [
         "--input", test_file,
         "--agents"
     ] + AGENTS + [
         "--starts"
     ] + starts
+    cmd = [sys.executable, "-m", "hurricane.run"] + cmd_args
     
-    print(f"Running: {' '.join(cmd)}")
+    if use_subprocess:
+        print(f"Running: {' '.join(cmd)}")
+    else:
+        print(f"Running: hurricane.run.main({cmd_args!r})")
     print("-" * 60)
     
     try:
-        subprocess.run(cmd)
+        if use_subprocess:
+            subprocess.run(cmd)
+        else:
+            from hurricane.run import main
+            main(cmd_args)
+    except SystemExit as e:
+        # argparse / bad agent type: report it like the child process would have
+        if e.code not in (None, 0):
+            print(e.code if isinstance(e.code, str) else f"Exited with status {e.code}")
     except KeyboardInterrupt:
         print("\nSimulation stopped by user.")
-    except Exception as e:
-        print(f"Error: {e}")
+    except Exception:
+        # the full traceback, as the child process would have shown it
+        traceback.print_exc()
+
+def _run_one(start_pos, test_file):
+    """Pool worker: one in-process simulation, its printout returned as a string."""
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        run_simulation(start_pos, test_file)
+    return buf.getvalue()
+
+def run_batch(configs, processes=None):
+    """
+    Run independent simulations in parallel, one per worker process.
+    
+    Args:
+        configs (list): (start_pos, test_file) pairs, as for run_simulation.
+        processes (int): Worker count (default: os.cpu_count()).
+    
+    Each run's output is printed whole, in the order of configs.
+    """
+    processes = min(processes or os.cpu_count() or 1, len(configs))
+    if processes <= 1:
+        outputs = [_run_one(*c) for c in configs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            outputs = pool.starmap(_run_one, configs)
+    for out in outputs:
+        print(out, end="")
 
 if __name__ == "__main__":
     # CHANGE THESE VALUES TO RUN DIFFERENT TESTS
@@ -56,3 +102,6 @@ if __name__ == "__main__":
     # # If start_pos is a single number (e.g. 1), it applies to ALL agents.
     # # If start_pos is a list (e.g. [1, 2]), it assigns starts to agents in order.
     # run_simulation(start_pos=[1, 1], test_file="testAhmad.txt")
+
+    # # Parameter sweep: independent runs spread over all cores.
+    # run_batch([(1, "test_14_limit.txt"), (1, "test_07_rta.txt"), (2, "medium.txt")])